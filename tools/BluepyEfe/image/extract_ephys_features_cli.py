@@ -14,35 +14,39 @@ from bluepyefe.tools import dict_to_json
 # CLI parsing
 
 def parse_features(value):
-    return value.split(",")
-
-
-CLI = argparse.ArgumentParser()
-CLI.add_argument("--input_file_current", nargs='?', type=str, required=True,
-                 help="path with current measurement of the recording")
-CLI.add_argument("--input_file_voltage", nargs='?', type=str, required=True,
-                 help="path with voltage measurement of the recording")
-CLI.add_argument("--output_file", nargs='?', type=Path, required=True,
-                 help="save file with extracted features to path")
-CLI.add_argument("--features", nargs='?', type=parse_features, required=True,
-                 help="features to extract, separated by comma")
-CLI.add_argument("--current_unit", nargs='?', type=str,
-                 default='pA',
-                 help='units of the current measurement')
-CLI.add_argument("--voltage_unit", nargs='?', type=str,
-                 default='mV',
-                 help='units of the voltage measurement')
-CLI.add_argument("--time_unit", nargs='?', type=str,
-                 default='s',
-                 help='units of the time measurement')
-CLI.add_argument("--time_step", nargs='?', type=float,
-                 default=0.00025,
-                 help='sampling period')
-CLI.add_argument("--ljp", nargs='?', type=float,
-                 default=14.0,
-                 help='ljp')
-CLI.add_argument("--protocol_name", nargs='?', type=str, required=True,
-                 help='name of the experimental protocol')
+    # Split once at parsing time, ignoring blanks around the names
+    features = (feature.strip() for feature in value.split(","))
+    return [feature for feature in features if feature]
+
+
+def _build_cli():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--input_file_current", nargs='?', type=str, required=True,
+                     help="path with current measurement of the recording")
+    cli.add_argument("--input_file_voltage", nargs='?', type=str, required=True,
+                     help="path with voltage measurement of the recording")
+    cli.add_argument("--output_file", nargs='?', type=Path, required=True,
+                     help="save file with extracted features to path")
+    cli.add_argument("--features", nargs='?', type=parse_features, required=True,
+                     help="features to extract, separated by comma")
+    cli.add_argument("--current_unit", nargs='?', type=str,
+                     default='pA',
+                     help='units of the current measurement')
+    cli.add_argument("--voltage_unit", nargs='?', type=str,
+                     default='mV',
+                     help='units of the voltage measurement')
+    cli.add_argument("--time_unit", nargs='?', type=str,
+                     default='s',
+                     help='units of the time measurement')
+    cli.add_argument("--time_step", nargs='?', type=float,
+                     default=0.00025,
+                     help='sampling period')
+    cli.add_argument("--ljp", nargs='?', type=float,
+                     default=14.0,
+                     help='ljp')
+    cli.add_argument("--protocol_name", nargs='?', type=str, required=True,
+                     help='name of the experimental protocol')
+    return cli
 
 
 def extract_features(input_file_current, input_file_voltage,
@@ -74,5 +78,5 @@ def extract_features(input_file_current, input_file_voltage,
 
 
 if __name__ == '__main__':
-    args, unknown = CLI.parse_known_args()
+    args, unknown = _build_cli().parse_known_args()
     extract_features(**vars(args))
@@ -1,26 +1,72 @@
 #!/usr/bin/env python
 
 import argparse
+from functools import partial
 from pathlib import Path
 
+import numpy as np
 from elephant.signal_processing import butter
-from utils import load_data, save_data, prepare_data, select_data, quantity_arg
+from utils import load_data, save_data, prepare_data, select_data, quantity_arg, map_signal_groups
 
 
-CLI = argparse.ArgumentParser()
-CLI.add_argument("--input_file", nargs="?", type=Path, required=True, help="path with file with the input data")
-CLI.add_argument("--input_format", nargs="?", type=str, default=None, help="format of the input data")
-CLI.add_argument("--output_file", nargs="?", type=Path, required=True, help="path to the file where to write data")
-CLI.add_argument("--output_format", nargs="?", type=str, required=True, help="format of the output data")
-CLI.add_argument("--highpass_frequency", nargs="?", type=quantity_arg, default=None, help="High-pass frequency cutoff")
-CLI.add_argument("--lowpass_frequency", nargs="?", type=quantity_arg, default=None, help="Low-pass frequency cutoff")
-CLI.add_argument("--order", nargs="?", type=int, required=True, help="Filter order")
-CLI.add_argument("--filter_function", nargs="?", type=str, required=True, help="Filter function")
-CLI.add_argument("--block_index", nargs="?", type=int, default=0, help="Index of the block to process (default: 0)")
-CLI.add_argument("--block_name", nargs="?", type=str, default=None, help="Name of the block to process (optional)")
-CLI.add_argument("--segment_index", nargs="?", type=int, default=0, help="Index of the segment to process (default: 0)")
-CLI.add_argument("--analog_signal_index", nargs="?", type=int, default=0, help="Index of the analog signal to process (default: 0)")
-CLI.add_argument("--action", nargs="?", type=str, required=True, help="Action on how to store the results with respect to the original data")
+def _build_cli():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--input_file", nargs="?", type=Path, required=True, help="path with file with the input data")
+    cli.add_argument("--input_format", nargs="?", type=str, default=None, help="format of the input data")
+    cli.add_argument("--output_file", nargs="?", type=Path, required=True, help="path to the file where to write data")
+    cli.add_argument("--output_format", nargs="?", type=str, required=True, help="format of the output data")
+    cli.add_argument("--highpass_frequency", nargs="?", type=quantity_arg, default=None, help="High-pass frequency cutoff")
+    cli.add_argument("--lowpass_frequency", nargs="?", type=quantity_arg, default=None, help="Low-pass frequency cutoff")
+    cli.add_argument("--order", nargs="?", type=int, required=True, help="Filter order")
+    cli.add_argument("--filter_function", nargs="?", type=str, required=True, help="Filter function")
+    cli.add_argument("--block_index", nargs="?", type=int, default=0, help="Index of the block to process (default: 0)")
+    cli.add_argument("--block_name", nargs="?", type=str, default=None, help="Name of the block to process (optional)")
+    cli.add_argument("--segment_index", nargs="?", type=int, default=0, help="Index of the segment to process (default: 0)")
+    cli.add_argument("--analog_signal_index", nargs="?", type=int, default=0, help="Index of the analog signal to process (default: 0)")
+    cli.add_argument("--action", nargs="?", type=str, required=True, help="Action on how to store the results with respect to the original data")
+    return cli
+
+
+def _filter_group(signals, sampling_frequency, **filter_kwargs):
+    """
+    Filter AnalogSignals that share the sampling rate and the number of
+    samples with a single call to the Elephant butter function.
+    Each filtered signal keeps the floating point data type of its input
+    signal, so that single precision recordings are not written back in
+    double precision. Integer signals are returned in double precision, as
+    casting them back would truncate the filtered values.
+    """
+    data = np.hstack([signal.magnitude for signal in signals])
+    filtered_data = butter(
+        signal=data,
+        sampling_frequency=sampling_frequency,
+        axis=0,
+        **filter_kwargs,
+    )
+
+    # Split the channels back into the original AnalogSignals
+    filtered_signals = []
+    start = 0
+    for signal in signals:
+        stop = start + signal.shape[1]
+        channels = filtered_data[:, start:stop]
+        if np.issubdtype(signal.dtype, np.floating):
+            channels = channels.astype(signal.dtype, copy=False)
+        filtered = signal.duplicate_with_new_data(channels * signal.units)
+        filtered.array_annotate(**signal.array_annotations)
+        filtered_signals.append(filtered)
+        start = stop
+    return filtered_signals
+
+
+def _filter_signals(signals, **filter_kwargs):
+    """
+    Filter a list of AnalogSignals with the Elephant butter function.
+    Signals that share the sampling rate and the number of samples are
+    filtered in a single call, so the filter is designed once per group
+    instead of once per signal.
+    """
+    return map_signal_groups(partial(_filter_group, **filter_kwargs), signals)
 
 
 def butterworth_filter(
@@ -51,18 +97,16 @@ def butterworth_filter(
         block, segment_index=segment_index, analog_signal_index=analog_signal_index
     )
 
-    # Iterate over all loaded AnalogSignals
-    filtered_signals = [
-        # Filter using Elephant butter function
-        butter(
-            signal=signal,
-            highpass_frequency=highpass_frequency,
-            lowpass_frequency=lowpass_frequency,
-            order=order,
-            filter_function=filter_function,
-        )
-        for signal in signals
-    ]
+    # Filter all loaded AnalogSignals using Elephant butter function. From the
+    # CLI this is a single signal; signals are only grouped and filtered in a
+    # thread pool when called with slices or slice strings as indexes
+    filtered_signals = _filter_signals(
+        signals,
+        highpass_frequency=highpass_frequency,
+        lowpass_frequency=lowpass_frequency,
+        order=order,
+        filter_function=filter_function,
+    )
 
     # Prepare a Block to save the filtered AnalogSignals
     new_block = prepare_data(block, analog_signal=filtered_signals, action=action)
@@ -72,5 +116,5 @@ def butterworth_filter(
 
 
 if __name__ == "__main__":
-    args, unknown = CLI.parse_known_args()
+    args, unknown = _build_cli().parse_known_args()
     butterworth_filter(**vars(args))
@@ -1,38 +1,74 @@
 import unittest
 import sys
 import os
+import threading
 import shutil
 import tempfile
 from pathlib import Path
 from datetime import datetime
 import uuid
-from collections import defaultdict
-from functools import partial
+import copy
+from collections.abc import Mapping
+from functools import lru_cache, partial
+from operator import attrgetter
 
 import numpy as np
 import quantities as pq
 import neo
-from elephant.spike_train_generation import StationaryPoissonProcess
+from elephant.signal_processing import butter, wavelet_transform
 
 # Get the current script directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # Get the parent directory
 parent_dir = os.path.dirname(current_dir)
-# Add the parent directory to sys.path
-sys.path.append(parent_dir)
+# Add the parent directory to sys.path, unless the tests are run from there
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-from utils import load_data, select_data, prepare_data, save_data
+from utils import load_data, select_data, prepare_data, save_data, map_signal_groups
+from utils import _get_io_class
+from butterworth_filter_cli import _filter_signals
+from wavelet_transform_cli import _transform_signals, freq_list
 
 
 # Data generation functions
 
-np.random.seed(1234)  # Set seed for reproducibility
+# Generator used for all the data drawn in this module, seeded for
+# reproducibility
+_RNG = np.random.default_rng(1234)
 
+# The values of the signals are never checked, so their sampling rate is
+# scaled down to keep the datasets small. Set TEST_SIZE_SCALE=1 to generate
+# the signals with the original sampling rate of 1 kHz.
+SIZE_SCALE = float(os.environ.get("TEST_SIZE_SCALE", "0.01"))
+SAMPLING_RATE = 1000 * SIZE_SCALE * pq.Hz
 
-def get_spike_trains(firing_rate, n_spiketrains, t_stop, source):
-    sts = StationaryPoissonProcess(firing_rate, t_stop=t_stop).generate_n_spiketrains(
-        n_spiketrains
+
+def n_samples(seconds):
+    # Expected number of samples of a generated signal with `seconds` duration
+    return int(round(seconds * SAMPLING_RATE.magnitude))
+
+
+def _poisson_spiketrains(firing_rate, n_spiketrains, t_stop):
+    # Stationary Poisson spike trains, with the spike times of all trains
+    # drawn in a single NumPy call
+    rate = firing_rate.rescale(pq.Hz).magnitude
+    end_time = t_stop.rescale(pq.s).magnitude
+
+    # Draw more inter-spike intervals than needed to reach `t_stop`, and
+    # drop the spike times after it
+    n_intervals = int(2 * rate * end_time) + 10
+    spike_times = np.cumsum(
+        _RNG.exponential(1 / rate, size=(n_spiketrains, n_intervals)), axis=1
     )
+    return [
+        neo.SpikeTrain(times[times <= end_time], units=pq.s, t_stop=t_stop)
+        for times in spike_times
+    ]
+
+
+def get_spike_trains(firing_rate, n_spiketrains, t_stop, source):
+    sts = _poisson_spiketrains(firing_rate, n_spiketrains, t_stop)
     for idx, st in enumerate(sts, start=1):
         st.name = f"Unit {idx}"
         st.annotate(source=source)
@@ -40,24 +76,28 @@ def get_spike_trains(firing_rate, n_spiketrains, t_stop, source):
 
 
 def get_analog_signal(
-    frequency, n_channels, t_stop, name, amplitude=3 * pq.V, sampling_rate=1000 * pq.Hz
+    frequency, n_channels, t_stop, name, amplitude=3 * pq.V, sampling_rate=SAMPLING_RATE
 ):
     end_time = t_stop.rescale(pq.s).magnitude
-    period = 1 / sampling_rate.rescale(pq.Hz).magnitude
+    rate = sampling_rate.rescale(pq.Hz).magnitude
     freq = frequency.rescale(pq.Hz).magnitude
 
-    samples = np.arange(0, end_time, period)
+    # Sample times from integer indexes, so that the number of samples does
+    # not depend on floating point accumulation
+    samples = np.arange(int(round(end_time * rate))) / rate
     base_signal = np.sin(2 * np.pi * freq * samples) * amplitude.magnitude
 
-    signal = np.tile(base_signal, (n_channels, 1))
-    noise = np.random.normal(0, 1, size=signal.shape)
-    signal += noise
+    # Time-major noise with the same sine broadcast to every channel, in
+    # single precision as in most recordings
+    signal = np.empty((len(samples), n_channels), dtype=np.float32)
+    _RNG.standard_normal(out=signal, dtype=np.float32)
+    signal += base_signal[:, np.newaxis]
 
     array_annotations = {
         "channel_names": np.array([f"chan{ch+1}" for ch in range(n_channels)])
     }
     return neo.AnalogSignal(
-        signal.T,
+        signal,
         units=amplitude.units,
         sampling_rate=sampling_rate,
         name=name,
@@ -66,8 +106,8 @@ def get_analog_signal(
 
 
 def add_ids_and_metadata(block, start_time):
+    # Parent links are set by Neo when the objects are added to the containers
     block.annotate(session_start_time=start_time)
-    block.create_relationship()
 
     # Storing UUIDs as description since NWBIO does not save Neo annotations
     block.description = str(uuid.uuid4())
@@ -144,17 +184,45 @@ def generate_block_2(start_time=None):
     return block
 
 
+# Expected (name, shape) of the AnalogSignals in the generated Blocks,
+# indexed by Block name, Segment index and AnalogSignal index
+EXPECTED_SIGNAL_INFO = {
+    "Data 1": ((("AS 1.1", (n_samples(2), 32)), ("AS 1.2", (n_samples(2), 8))),),
+    "Data 2": (
+        (
+            ("AS 1.1", (n_samples(3), 32)),
+            ("AS 1.2", (n_samples(3), 8)),
+            ("AS 1.3", (n_samples(3), 16)),
+        ),
+        (("AS 2.1", (n_samples(2), 8)), ("AS 2.2", (n_samples(2), 16))),
+    ),
+}
+
+
+def unit_names(n_spiketrains):
+    # Expected names of a group of SpikeTrains from `get_spike_trains`
+    return [f"Unit {idx}" for idx in range(1, n_spiketrains + 1)]
+
+
 # File IO functions
 
 
 def write_dataset(filename, blocks, io_type, io_args):
+    # All Blocks are written in a single call, and the file is closed
+    # afterwards so that it is flushed before any test reads it
     io = io_type(filename, *io_args)
-    io.write_all_blocks(blocks)
+    try:
+        io.write_all_blocks(blocks)
+    finally:
+        io.close()
 
 
 def read_dataset(filename, io_type, io_args):
     io = io_type(filename, *io_args)
-    blocks = io.read_all_blocks(lazy=False)
+    try:
+        blocks = io.read_all_blocks(lazy=False)
+    finally:
+        io.close()
     return blocks
 
 
@@ -170,6 +238,80 @@ READ_FUNCTIONS = {
 }
 
 
+# Test datasets: a NIX and an NWB file with one Block ("Data 1") and with
+# two Blocks ("Data 1" and "Data 2")
+DATASETS = ("nix_1", "nix_2", "nwb_1", "nwb_2")
+
+
+@lru_cache(maxsize=None)
+def get_tmp_dir():
+    # Temporary folder shared by all test cases. It is removed when the
+    # interpreter exits. Each process (e.g., each pytest-xdist worker) writes
+    # its own datasets, so the folder is named after the worker
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "main")
+    return tempfile.TemporaryDirectory(prefix=f"elephant_tests_{worker}_")
+
+
+# Start time annotated in all generated Blocks
+SESSION_START_TIME = datetime.now()
+
+
+@lru_cache(maxsize=None)
+def generate_block(block_index):
+    # Generate the Block "Data 1" (index 0) or "Data 2" (index 1) once per
+    # test session, when first requested
+    generate = (generate_block_1, generate_block_2)[block_index]
+    return generate(SESSION_START_TIME)
+
+
+@lru_cache(maxsize=None)
+def generate_dataset(file_stem):
+    # Get the Blocks of one dataset. Different copies of the Blocks are
+    # made for each dataset, as NWB files require change in the name
+    # of AnalogSignals and the IO modifies the input objects.
+    num_blocks = int(file_stem.split("_")[1])
+    return [copy.deepcopy(generate_block(index)) for index in range(num_blocks)]
+
+
+@lru_cache(maxsize=None)
+def write_dataset_file(file_stem):
+    # Write the temporary file of one dataset and return its path. Copies of
+    # the single Block files are made with the extension ".data".
+    # Tests that only use the generated Blocks never write the files.
+    file_format = file_stem.split("_")[0]
+    dest_file = Path(get_tmp_dir().name) / f"{file_stem}.{file_format}"
+    WRITE_FUNCTIONS[file_format](dest_file, generate_dataset(file_stem))
+
+    if file_stem.endswith("_1"):
+        # The copies are only read, so a hard link is enough where supported
+        try:
+            os.link(dest_file, dest_file.with_suffix(".data"))
+        except OSError:
+            shutil.copy(src=str(dest_file), dst=str(dest_file.with_suffix(".data")))
+
+    return dest_file
+
+
+class LazyDatasets(Mapping):
+    # Read-only mapping from dataset name to the value returned by `create`
+    # (the file path or the list of Blocks). Each dataset is generated and
+    # written once per test session, the first time a test requests it.
+
+    def __init__(self, create):
+        self._create = create
+
+    def __getitem__(self, file_stem):
+        if file_stem not in DATASETS:
+            raise KeyError(file_stem)
+        return self._create(file_stem)
+
+    def __iter__(self):
+        return iter(DATASETS)
+
+    def __len__(self):
+        return len(DATASETS)
+
+
 # Unit tests
 
 
@@ -185,24 +327,17 @@ class ElephantUtilsTestCase(unittest.TestCase):
         assert first.name == second.name
         assert first.description == second.description
 
-        for seg_first, seg_second in zip(first.segments, second.segments):
-            assert seg_first.name == seg_second.name
-            if not nwb:
-                assert seg_first.description == seg_second.description
+        get_info = attrgetter("name") if nwb else attrgetter("name", "description")
 
-            for signal_first, signal_second in zip(
-                seg_first.analogsignals, seg_second.analogsignals
-            ):
-                assert signal_first.name == signal_second.name
-                if not nwb:
-                    assert signal_first.description == signal_second.description
+        def check_objects_equal(objects_first, objects_second):
+            assert list(map(get_info, objects_first)) == list(
+                map(get_info, objects_second)
+            )
 
-            for st_first, st_second in zip(
-                seg_first.spiketrains, seg_second.spiketrains
-            ):
-                assert st_first.name == st_second.name
-                if not nwb:
-                    assert st_first.description == st_second.description
+        check_objects_equal(first.segments, second.segments)
+        for seg_first, seg_second in zip(first.segments, second.segments):
+            check_objects_equal(seg_first.analogsignals, seg_second.analogsignals)
+            check_objects_equal(seg_first.spiketrains, seg_second.spiketrains)
 
     @staticmethod
     def _check_block_1_data(block, *, nwb):
@@ -216,21 +351,21 @@ class ElephantUtilsTestCase(unittest.TestCase):
         assert seg_1.t_stop == 2 * pq.s
 
         assert len(seg_1.analogsignals) == 2
-        assert seg_1.analogsignals[0].shape == (2000, 32)
+        assert seg_1.analogsignals[0].shape == (n_samples(2), 32)
         assert (
             seg_1.analogsignals[0].name == "AS 1.1" if not nwb else "Segment 1 AS 1.1 0"
         )
-        assert seg_1.analogsignals[1].shape == (2000, 8)
+        assert seg_1.analogsignals[1].shape == (n_samples(2), 8)
         assert (
             seg_1.analogsignals[1].name == "AS 1.2" if not nwb else "Segment 1 AS 1.2 1"
         )
 
         assert len(seg_1.spiketrains) == 30
-        for idx, st in enumerate(seg_1.spiketrains, start=1):
-            # TODO: remove after NWBio supports annotations
-            if not nwb:
-                assert st.annotations["source"] == "Region 1"
-            assert st.name == f"Unit {idx}"
+        # TODO: remove after NWBio supports annotations
+        if not nwb:
+            sources = [st.annotations["source"] for st in seg_1.spiketrains]
+            assert sources == ["Region 1"] * 30
+        assert [st.name for st in seg_1.spiketrains] == unit_names(30)
 
     @staticmethod
     def _check_block_2_data(block, *, nwb):
@@ -246,19 +381,19 @@ class ElephantUtilsTestCase(unittest.TestCase):
         assert seg_2_2.t_stop == 2 * pq.s
 
         assert len(seg_2_1.analogsignals) == 3
-        assert seg_2_1.analogsignals[0].shape == (3000, 32)
+        assert seg_2_1.analogsignals[0].shape == (n_samples(3), 32)
         assert (
             seg_2_1.analogsignals[0].name == "AS 1.1"
             if not nwb
             else "Segment 2.1 AS 1.1 0"
         )
-        assert seg_2_1.analogsignals[1].shape == (3000, 8)
+        assert seg_2_1.analogsignals[1].shape == (n_samples(3), 8)
         assert (
             seg_2_1.analogsignals[1].name == "AS 1.2"
             if not nwb
             else "Segment 2.1 AS 1.2 1"
         )
-        assert seg_2_1.analogsignals[2].shape == (3000, 16)
+        assert seg_2_1.analogsignals[2].shape == (n_samples(3), 16)
         assert (
             seg_2_1.analogsignals[2].name == "AS 1.3"
             if not nwb
@@ -266,21 +401,20 @@ class ElephantUtilsTestCase(unittest.TestCase):
         )
 
         assert len(seg_2_1.spiketrains) == 45
-        for idx, st in enumerate(seg_2_1.spiketrains, start=1):
-            source = "ST 1.2" if idx > 15 else "ST 1.1"
-            unit_id = idx - 15 if idx > 15 else idx
-            if not nwb:
-                assert st.annotations["source"] == source
-            assert st.name == f"Unit {unit_id}"
+        if not nwb:
+            sources = [st.annotations["source"] for st in seg_2_1.spiketrains]
+            assert sources == ["ST 1.1"] * 15 + ["ST 1.2"] * 30
+        names = [st.name for st in seg_2_1.spiketrains]
+        assert names == unit_names(15) + unit_names(30)
 
         assert len(seg_2_2.analogsignals) == 2
-        assert seg_2_2.analogsignals[0].shape == (2000, 8)
+        assert seg_2_2.analogsignals[0].shape == (n_samples(2), 8)
         assert (
             seg_2_2.analogsignals[0].name == "AS 2.1"
             if not nwb
             else "Segment 2.2 AS 2.1 0"
         )
-        assert seg_2_2.analogsignals[1].shape == (2000, 16)
+        assert seg_2_2.analogsignals[1].shape == (n_samples(2), 16)
         assert (
             seg_2_2.analogsignals[1].name == "AS 2.2"
             if not nwb
@@ -288,45 +422,27 @@ class ElephantUtilsTestCase(unittest.TestCase):
         )
 
         assert len(seg_2_2.spiketrains) == 10
-        for idx, st in enumerate(seg_2_2.spiketrains, start=1):
-            if not nwb:
-                assert st.annotations["source"] == "ST 2"
-            assert st.name == f"Unit {idx}"
+        if not nwb:
+            sources = [st.annotations["source"] for st in seg_2_2.spiketrains]
+            assert sources == ["ST 2"] * 10
+        assert [st.name for st in seg_2_2.spiketrains] == unit_names(10)
 
     @classmethod
     def setUpClass(cls):
-        # Write temporary files:
-        # - A dictionary stores the paths to the file names.
-        # - Different copies of the Blocks are generated and stored, as NWB
-        #   files require change in the name of AnalogSignals and the IO
-        #   modifies the input objects.
-        # - Copies with different extensions are also made
-
-        cls.tmp_dir = tempfile.TemporaryDirectory()
-        cls.dataset_files = {}
-        cls.blocks = defaultdict(list)
-
-        for file_format in ("nix", "nwb"):
-            for num_blocks in range(1, 3):
-                file_stem = f"{file_format}_{num_blocks}"
-                dest_file = Path(cls.tmp_dir.name) / f"{file_stem}.{file_format}"
-                cls.dataset_files[file_stem] = dest_file
-
-                start_time = datetime.now()
-                cls.blocks[file_stem].append(generate_block_1(start_time))
-                if num_blocks > 1:
-                    cls.blocks[file_stem].append(generate_block_2(start_time))
-
-                WRITE_FUNCTIONS[file_format](dest_file, cls.blocks[file_stem])
-
-        # Copies of NIX and NWB datasets are made with the extension ".data"
-        source_nwb = cls.dataset_files["nwb_1"]
-        cls.new_nwb_file = source_nwb.with_suffix(".data")
-        shutil.copy(src=str(source_nwb), dst=str(cls.new_nwb_file))
-
-        source_nix = cls.dataset_files["nix_1"]
-        cls.new_nix_file = source_nix.with_suffix(".data")
-        shutil.copy(src=str(source_nix), dst=str(cls.new_nix_file))
+        # Datasets are only generated and written when a test uses them
+        cls.tmp_dir = get_tmp_dir()
+        cls.dataset_files = LazyDatasets(write_dataset_file)
+        cls.blocks = LazyDatasets(generate_dataset)
+
+    @property
+    def new_nwb_file(self):
+        # Link to the "nwb_1" dataset with the extension ".data"
+        return self.dataset_files["nwb_1"].with_suffix(".data")
+
+    @property
+    def new_nix_file(self):
+        # Link to the "nix_1" dataset with the extension ".data"
+        return self.dataset_files["nix_1"].with_suffix(".data")
 
     # Tests to validate the generated data and files
 
@@ -371,6 +487,16 @@ class ElephantUtilsTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             load_data(self.new_nix_file, block_index=0, block_name="Data 1")
 
+    def test_get_io_class(self):
+        # Checks if IO classes are found by the name exported by neo.io, also
+        # when it differs from the class name or the class name is ambiguous
+        for name in ("NixIO", "NWBIO", "NeuroshareIO", "NixIOFr"):
+            with self.subTest(name=name):
+                assert _get_io_class(name) is getattr(neo.io, name)
+
+        with self.assertRaises(ValueError):
+            _get_io_class("NeurosharectypesIO")
+
     def test_load_data_detect_input_format(self):
         # Checks if the load function can infer NWB or NIX format from the
         # file name, and load the first block using the correct IO
@@ -433,137 +559,55 @@ class ElephantUtilsTestCase(unittest.TestCase):
             with self.assertRaises(ValueError):
                 block = load_data(dataset, block_index=0, input_format="NWBIO")
 
-    def test_load_data_nwb_wrong_index(self):
-        # Checks if load function raises ValueError if a wrong Block index is
-        # passed when trying to load NWB files
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nwb_1"], block_index=1)
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nwb_2"], block_index=2)
-
-    def test_load_data_nix_wrong_index(self):
-        # Checks if load function raises ValueError if a wrong Block index is
-        # passed when trying to load NIX files
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nix_1"], block_index=1)
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nix_2"], block_index=2)
-
-    def test_load_data_nwb_wrong_name(self):
-        # Checks if load function raises ValueError if a wrong Block name is
-        # passed when trying to load NWB files
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nwb_1"], block_name="Data 2")
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nwb_2"], block_name="Data 3")
-
-    def test_load_data_nix_wrong_name(self):
-        # Checks if load function raises ValueError if a wrong Block name is
-        # passed when trying to load NIX files
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nix_1"], block_name="Data 2")
-        with self.assertRaises(ValueError):
-            block = load_data(self.dataset_files["nix_2"], block_name="Data 3")
-
-    def test_load_data_nwb_by_index_one_block(self):
-        # Checks if the load function loads the correct Block from an NWB file
-        # with a single block when specifying its index
-        block = load_data(self.dataset_files["nwb_1"], block_index=0)
-        self._check_block_objects_equal(
-            first=block, second=self.blocks["nwb_1"][0], nwb=True
-        )
-        self._check_block_1_data(block, nwb=True)
-
-    def test_load_data_nwb_by_index_two_blocks(self):
-        # Checks if the load function loads the correct Block from an NWB file
-        # with two blocks when specifying its index
-        block_1 = load_data(self.dataset_files["nwb_2"], block_index=0)
-        self._check_block_objects_equal(
-            first=block_1, second=self.blocks["nwb_2"][0], nwb=True
-        )
-        self._check_block_1_data(block_1, nwb=True)
-
-        block_2 = load_data(self.dataset_files["nwb_2"], block_index=1)
-        # FIXME: second block is read with the description of the first
-        assert isinstance(block_2, neo.Block)
-        # self._check_block_objects_equal(first=block_2,
-        #                                 second=self.blocks['nwb_2'][1],
-        #                                 nwb=True)
-        self._check_block_2_data(block_2, nwb=True)
-
-    def test_load_data_nwb_by_name_one_block(self):
-        # Checks if the load function loads the correct Block from an NWB file
-        # with one block when specifying its name
-        block = load_data(self.dataset_files["nwb_1"], block_name="Data 1")
-        self._check_block_objects_equal(
-            first=block, second=self.blocks["nwb_1"][0], nwb=True
-        )
-        self._check_block_1_data(block, nwb=True)
-
-    def test_load_data_nwb_by_name_two_blocks(self):
-        # Checks if the load function loads the correct Block from an NWB file
-        # with two blocks when specifying its name
-        block_1 = load_data(self.dataset_files["nwb_2"], block_name="Data 1")
-        self._check_block_objects_equal(
-            first=block_1, second=self.blocks["nwb_2"][0], nwb=True
-        )
-        self._check_block_1_data(block_1, nwb=True)
-
-        block_2 = load_data(self.dataset_files["nwb_2"], block_name="Data 2")
-        assert isinstance(block_2, neo.Block)
-        # FIXME: second block is read with the description of the first
-        # self._check_block_objects_equal(first=block_2,
-        #                                 second=self.blocks['nwb_2'][1],
-        #                                 nwb=True)
-        self._check_block_2_data(block_2, nwb=True)
-
-    def test_load_data_nix_by_index_one_block(self):
-        # Checks if the load function loads the correct Block from a NIX file
-        # with a single block when specifying its index
-        block = load_data(self.dataset_files["nix_1"], block_index=0)
-        self._check_block_objects_equal(
-            first=block, second=self.blocks["nix_1"][0], nwb=False
-        )
-        self._check_block_1_data(block, nwb=False)
-
-    def test_load_data_nix_by_index_two_blocks(self):
-        # Checks if the load function loads the correct Block from a NIX file
-        # with two blocks when specifying its index
-        block_1 = load_data(self.dataset_files["nix_2"], block_index=0)
-        self._check_block_objects_equal(
-            first=block_1, second=self.blocks["nix_2"][0], nwb=False
-        )
-        self._check_block_1_data(block_1, nwb=False)
-
-        block_2 = load_data(self.dataset_files["nix_2"], block_index=1)
-        self._check_block_objects_equal(
-            first=block_2, second=self.blocks["nix_2"][1], nwb=False
-        )
-        self._check_block_2_data(block_2, nwb=False)
-
-    def test_load_data_nix_by_name_one_block(self):
-        # Checks if the load function loads the correct Block from a NIX file
-        # with one block when specifying its name
-        block = load_data(self.dataset_files["nix_1"], block_name="Data 1")
-        self._check_block_objects_equal(
-            first=block, second=self.blocks["nix_1"][0], nwb=False
-        )
-        self._check_block_1_data(block, nwb=False)
-
-    def test_load_data_nix_by_name_two_blocks(self):
-        # Checks if the load function loads the correct Block from a NIX file
-        # with two blocks when specifying its name
-        block_1 = load_data(self.dataset_files["nix_2"], block_name="Data 1")
-        self._check_block_objects_equal(
-            first=block_1, second=self.blocks["nix_2"][0], nwb=False
-        )
-        self._check_block_1_data(block_1, nwb=False)
-
-        block_2 = load_data(self.dataset_files["nix_2"], block_name="Data 2")
-        self._check_block_objects_equal(
-            first=block_2, second=self.blocks["nix_2"][1], nwb=False
-        )
-        self._check_block_2_data(block_2, nwb=False)
+    def test_load_data_wrong_block(self):
+        # Checks if load function raises ValueError if a wrong Block index or
+        # name is passed when trying to load NIX or NWB files. Indexes that
+        # are not integers are rejected, even if they match a Block name.
+        wrong_selections = {
+            "1": (
+                {"block_index": 1},
+                {"block_index": "0"},
+                {"block_index": "Data 1"},
+                {"block_name": "Data 2"},
+            ),
+            "2": (
+                {"block_index": 2},
+                {"block_index": "1"},
+                {"block_index": "Data 2"},
+                {"block_name": "Data 3"},
+            ),
+        }
+        for dataset in DATASETS:
+            for selection in wrong_selections[dataset.split("_")[1]]:
+                with self.subTest(
+                    f"Wrong block: {dataset}", dataset=dataset, **selection
+                ):
+                    with self.assertRaises(ValueError):
+                        load_data(self.dataset_files[dataset], **selection)
+
+    def test_load_data_by_index_and_name(self):
+        # Checks if the load function loads the correct Block from NIX and NWB
+        # files with one or two blocks when specifying its index or its name
+        check_block_data = (self._check_block_1_data, self._check_block_2_data)
+        for dataset in DATASETS:
+            nwb = "nwb" in dataset
+            input_file = self.dataset_files[dataset]
+            for block_index, expected_block in enumerate(self.blocks[dataset]):
+                for selection in (
+                    {"block_index": block_index},
+                    {"block_name": expected_block.name},
+                ):
+                    with self.subTest(f"Load: {dataset}", dataset=dataset, **selection):
+                        block = load_data(input_file, **selection)
+                        if nwb and block_index == 1:
+                            # FIXME: second block is read with the description
+                            # of the first
+                            assert isinstance(block, neo.Block)
+                        else:
+                            self._check_block_objects_equal(
+                                first=block, second=expected_block, nwb=nwb
+                            )
+                        check_block_data[block_index](block, nwb=nwb)
 
     # Select data tests
 
@@ -575,30 +619,17 @@ class ElephantUtilsTestCase(unittest.TestCase):
         # Tests are based on blocks "Data 1" and "Data 2" from the "nix_2"
         # dataset.
         # We check if every analog signal is correctly loaded.
-        # The verified attributes are name, description, and shape. They
-        # are stored below according to the hierarchy in the block and order
-        # in the segment. The expected IDs are also cross-checked.
-
-        # For each block:
-        # {Seg0: [(AS0 name, AS0 shape), (AS1 name, AS1 shape),...],
-        #  Seg1: [(AS0 name, AS0 shape), (AS1 name, AS1 shape),...],
-        #  ...}
-
-        expected_signal_info = {
-            "Data 1": {0: [("AS 1.1", (2000, 32)), ("AS 1.2", (2000, 8))]},
-            "Data 2": {
-                0: [
-                    ("AS 1.1", (3000, 32)),
-                    ("AS 1.2", (3000, 8)),
-                    ("AS 1.3", (3000, 16)),
-                ],
-                1: [("AS 2.1", (2000, 8)), ("AS 2.2", (2000, 16))],
-            },
-        }
-
+        # The verified attributes are name, description, and shape. The
+        # expected names and shapes are in `EXPECTED_SIGNAL_INFO`, according
+        # to the hierarchy in the block and order in the segment. The
+        # expected IDs are also cross-checked.
         test_iterations = {
-            "Data 1": ((0, 0), (0, 1)),
-            "Data 2": ((0, 0), (0, 1), (0, 2), (1, 0), (1, 1)),
+            block_name: tuple(
+                (segment_index, signal_index)
+                for segment_index, signals in enumerate(segments)
+                for signal_index in range(len(signals))
+            )
+            for block_name, segments in EXPECTED_SIGNAL_INFO.items()
         }
         for block in self.blocks["nix_2"]:
             block_name = block.name
@@ -630,7 +661,7 @@ class ElephantUtilsTestCase(unittest.TestCase):
                     assert signal.shape == expected_signal.shape
 
                     # Check if the expected information match
-                    expected_sel_info = expected_signal_info[block_name][segment_index][
+                    expected_sel_info = EXPECTED_SIGNAL_INFO[block_name][segment_index][
                         signal_index
                     ]
                     assert signal.name == expected_sel_info[0]  # name
@@ -668,57 +699,19 @@ class ElephantUtilsTestCase(unittest.TestCase):
         block = self.blocks["nix_2"][1]
         segments = block.segments
 
-        expected_signal_info = {
-            0: {
-                "0:1": [("AS 1.1", (3000, 32)), ("AS 1.2", (3000, 8))],
-                "0:2": [
-                    ("AS 1.1", (3000, 32)),
-                    ("AS 1.2", (3000, 8)),
-                    ("AS 1.3", (3000, 16)),
-                ],
-                "1:2": [("AS 1.2", (3000, 8)), ("AS 1.3", (3000, 16))],
-                "all": [
-                    ("AS 1.1", (3000, 32)),
-                    ("AS 1.2", (3000, 8)),
-                    ("AS 1.3", (3000, 16)),
-                ],
-            },
-            1: {
-                "0:1": [("AS 2.1", (2000, 8)), ("AS 2.2", (2000, 16))],
-                "all": [("AS 2.1", (2000, 8)), ("AS 2.2", (2000, 16))],
-            },
-        }
-
-        expected_objects = {
-            0: {
-                "0:1": [segments[0].analogsignals[0], segments[0].analogsignals[1]],
-                "0:2": [
-                    segments[0].analogsignals[0],
-                    segments[0].analogsignals[1],
-                    segments[0].analogsignals[2],
-                ],
-                "1:2": [segments[0].analogsignals[1], segments[0].analogsignals[2]],
-                "all": [
-                    segments[0].analogsignals[0],
-                    segments[0].analogsignals[1],
-                    segments[0].analogsignals[2],
-                ],
-            },
-            1: {
-                "0:1": [segments[1].analogsignals[0], segments[1].analogsignals[1]],
-                "all": [segments[1].analogsignals[0], segments[1].analogsignals[1]],
-            },
-        }
-
+        # Ranges given as strings (inclusive end) or slices (exclusive end),
+        # and the signal indexes they select
         test_iterations = [
-            (1, "0:1"),
-            (1, "all"),
-            (0, "0:1"),
-            (0, "0:2"),
-            (0, "1:2"),
-            (0, "all"),
+            (1, "0:1", slice(0, 2)),
+            (1, "all", slice(None)),
+            (0, "0:1", slice(0, 2)),
+            (0, "0:2", slice(0, 3)),
+            (0, "1:2", slice(1, 3)),
+            (0, "all", slice(None)),
+            (0, slice(1, 3), slice(1, 3)),
+            (1, slice(None), slice(None)),
         ]
-        for segment_index, signal_index in test_iterations:
+        for segment_index, signal_index, signal_range in test_iterations:
             with self.subTest(
                 f"Seg {segment_index}, multiple signal {signal_index}",
                 seg=segment_index,
@@ -732,8 +725,10 @@ class ElephantUtilsTestCase(unittest.TestCase):
                 assert isinstance(signals, list)
                 assert all([isinstance(signal, neo.AnalogSignal) for signal in signals])
 
-                expected_signals = expected_objects[segment_index][signal_index]
-                expected_infos = expected_signal_info[segment_index][signal_index]
+                expected_signals = segments[segment_index].analogsignals[signal_range]
+                expected_infos = EXPECTED_SIGNAL_INFO["Data 2"][segment_index][
+                    signal_range
+                ]
                 assert len(signals) == len(expected_signals)
 
                 for idx, signal in enumerate(signals):
@@ -761,32 +756,19 @@ class ElephantUtilsTestCase(unittest.TestCase):
         block = self.blocks["nix_2"][1]
         segments = block.segments
 
-        expected_signal_info = {
-            "0:1": {
-                0: [("AS 1.1", (3000, 32)), ("AS 2.1", (2000, 8))],
-                1: [("AS 1.2", (3000, 8)), ("AS 2.2", (2000, 16))],
-            },
-            "all": {
-                0: [("AS 1.1", (3000, 32)), ("AS 2.1", (2000, 8))],
-                1: [("AS 1.2", (3000, 8)), ("AS 2.2", (2000, 16))],
-            },
-        }
-
-        expected_objects = {
-            "0:1": {
-                0: [segments[0].analogsignals[0], segments[1].analogsignals[0]],
-                1: [segments[0].analogsignals[1], segments[1].analogsignals[1]],
-            },
-            "all": {
-                0: [segments[0].analogsignals[0], segments[1].analogsignals[0]],
-                1: [segments[0].analogsignals[1], segments[1].analogsignals[1]],
-            },
-        }
-
         expected_errors = [("0:1", 3), ("all", 3)]
 
-        test_iterations = [("0:1", 0), ("0:1", 1), ("all", 0), ("all", 1)]
-        for segment_index, signal_index in test_iterations:
+        # Ranges given as strings (inclusive end) or slices (exclusive end),
+        # and the segment indexes they select
+        test_iterations = [
+            ("0:1", 0, slice(0, 2)),
+            ("0:1", 1, slice(0, 2)),
+            ("all", 0, slice(None)),
+            ("all", 1, slice(None)),
+            (slice(0, 2), 1, slice(0, 2)),
+            (slice(None), 0, slice(None)),
+        ]
+        for segment_index, signal_index, segment_range in test_iterations:
             with self.subTest(
                 f"Multiple Seg {segment_index}, signal {signal_index}",
                 seg=segment_index,
@@ -800,8 +782,14 @@ class ElephantUtilsTestCase(unittest.TestCase):
                 assert isinstance(signals, list)
                 assert all([isinstance(signal, neo.AnalogSignal) for signal in signals])
 
-                expected_signals = expected_objects[segment_index][signal_index]
-                expected_infos = expected_signal_info[segment_index][signal_index]
+                expected_signals = [
+                    segment.analogsignals[signal_index]
+                    for segment in segments[segment_range]
+                ]
+                expected_infos = [
+                    signals[signal_index]
+                    for signals in EXPECTED_SIGNAL_INFO["Data 2"][segment_range]
+                ]
                 assert len(signals) == len(expected_signals)
 
                 for idx, signal in enumerate(signals):
@@ -907,7 +895,7 @@ class ElephantUtilsTestCase(unittest.TestCase):
         assert len(new_block.segments[0].analogsignals) == 1
         assert len(new_block.segments[0].spiketrains) == 0
         assert new_block.segments[0].analogsignals[0].name == "new"
-        assert new_block.segments[0].analogsignals[0].shape == (500, 8)
+        assert new_block.segments[0].analogsignals[0].shape == (n_samples(0.5), 8)
         assert new_block.segments[0].analogsignals[0].t_stop == 0.5 * pq.s
 
     def test_prepare_data_new_block_multiple_analog_signals(self):
@@ -936,12 +924,46 @@ class ElephantUtilsTestCase(unittest.TestCase):
         assert len(new_block.segments[0].analogsignals) == 2
         assert len(new_block.segments[0].spiketrains) == 0
         assert new_block.segments[0].analogsignals[0].name == "dual 1"
-        assert new_block.segments[0].analogsignals[0].shape == (500, 16)
+        assert new_block.segments[0].analogsignals[0].shape == (n_samples(0.5), 16)
         assert new_block.segments[0].analogsignals[0].t_stop == 0.5 * pq.s
         assert new_block.segments[0].analogsignals[1].name == "dual 2"
-        assert new_block.segments[0].analogsignals[1].shape == (500, 4)
+        assert new_block.segments[0].analogsignals[1].shape == (n_samples(0.5), 4)
         assert new_block.segments[0].analogsignals[1].t_stop == 0.5 * pq.s
 
+    def test_prepare_data_add(self):
+        # Checks if the function that prepares the block for saving adds the
+        # analog signals and spike trains produced by the component to the
+        # first segment of the existing block.
+        new_signals = [get_analog_signal(40 * pq.Hz, 8, 0.5 * pq.s, "added")]
+        new_spiketrains = get_spike_trains(10 * pq.Hz, 2, 2 * pq.s, "added")
+
+        old_block = copy.deepcopy(generate_block(0))
+        new_block = prepare_data(
+            old_block,
+            analog_signal=new_signals,
+            spike_train=new_spiketrains,
+            action="add",
+        )
+        assert new_block is old_block
+
+        # Existing data is kept, and the new data is appended
+        assert len(new_block.segments) == 1
+        segment = new_block.segments[0]
+        assert [signal.name for signal in segment.analogsignals] == [
+            "AS 1.1",
+            "AS 1.2",
+            "added",
+        ]
+        assert segment.analogsignals[2].segment is segment
+        assert len(segment.spiketrains) == 32
+        sources = [st.annotations["source"] for st in segment.spiketrains]
+        assert sources == ["Region 1"] * 30 + ["added"] * 2
+
+        # A segment is created if the block has none
+        new_block = prepare_data(neo.Block(), analog_signal=new_signals, action="add")
+        assert len(new_block.segments) == 1
+        assert new_block.segments[0].analogsignals[0].name == "added"
+
     # Save data tests
 
     def test_save_data_invalid_options(self):
@@ -949,7 +971,7 @@ class ElephantUtilsTestCase(unittest.TestCase):
         # options. Actions allowed are "new", "replace", "update".
         # File must not be saved in case of invalid options.
 
-        new_block = generate_block_1(datetime.now())
+        new_block = copy.deepcopy(generate_block(0))
         new_file = Path(self.tmp_dir.name) / f"{uuid.uuid4()}.data"
         assert not new_file.exists()
 
@@ -964,12 +986,17 @@ class ElephantUtilsTestCase(unittest.TestCase):
             save_data(new_block, new_file, output_format="invalid")
         assert not new_file.exists()
 
+        # NWB files can not be updated
+        with self.assertRaises(ValueError):
+            save_data(new_block, new_file, output_format="NWBIO", action="update")
+        assert not new_file.exists()
+
     def test_save_data_failed_detect_output_format(self):
         # Checks if the save function raises ValueError if the output format
         # was not specified and the format could not be inferred when trying
         # to save a block
         output_file = Path(self.tmp_dir.name) / "new_block.data"
-        new_block = generate_block_1(datetime.now())
+        new_block = copy.deepcopy(generate_block(0))
         assert not output_file.exists()
         with self.assertRaises(ValueError):
             save_data(
@@ -998,11 +1025,9 @@ class ElephantUtilsTestCase(unittest.TestCase):
                 output_format=output_format,
                 nwb=nwb,
             ):
-                if nwb:
-                    self.skipTest("NWBIO is not fully functional yet")
                 file_name = f"{uuid.uuid4()}.{file_format}"
                 output_file = Path(self.tmp_dir.name) / file_name
-                new_block = generate_block_1(datetime.now())
+                new_block = copy.deepcopy(generate_block(0))
 
                 assert not output_file.exists()
                 save_data(
@@ -1026,6 +1051,20 @@ class ElephantUtilsTestCase(unittest.TestCase):
                 with self.assertRaises(ValueError):
                     load_data(output_file, input_format="NWBIO" if not nwb else "NixIO")
 
+    def test_save_data_nwb_session_start_time(self):
+        # Checks if a Block without a session start time is saved to NWB with
+        # a default one, without adding it to the annotations of the Block.
+        new_block = copy.deepcopy(generate_block(0))
+        del new_block.annotations["session_start_time"]
+        annotations = dict(new_block.annotations)
+        output_file = Path(self.tmp_dir.name) / f"{uuid.uuid4()}.nwb"
+
+        save_data(new_block, output_file=output_file, action="new")
+
+        assert new_block.annotations == annotations
+        saved_blocks = READ_FUNCTIONS["nwb"](output_file)
+        assert isinstance(saved_blocks[0].annotations["session_start_time"], datetime)
+
     @unittest.skip
     def test_save_data_new_existing_nix(self):
         # Checks if the save function saves the block to a NIX file that exists
@@ -1100,10 +1139,149 @@ class ElephantUtilsTestCase(unittest.TestCase):
         # data.
         pass
 
-    @classmethod
-    def tearDownClass(cls):
-        # Clean temporary folder
-        cls.tmp_dir.cleanup()
+    # Signal processing tests
+
+    def test_filter_signals_data_type(self):
+        # Checks if the filtered signals keep a floating point data type, and
+        # if integer signals are not truncated after filtering.
+        filter_kwargs = dict(
+            highpass_frequency=10 * pq.Hz,
+            lowpass_frequency=None,
+            order=4,
+            filter_function="filtfilt",
+        )
+        float_signal = get_analog_signal(
+            5 * pq.Hz, 2, 1 * pq.s, "float", sampling_rate=100 * pq.Hz
+        )
+        int_signal = neo.AnalogSignal(
+            np.arange(200, dtype=np.int16).reshape(100, 2),
+            units=pq.mV,
+            sampling_rate=100 * pq.Hz,
+        )
+
+        for signal, expected_dtype in (
+            (float_signal, np.float32),
+            (int_signal, np.float64),
+        ):
+            with self.subTest(dtype=signal.dtype):
+                filtered = _filter_signals([signal], **filter_kwargs)[0]
+                expected = butter(signal, **filter_kwargs)
+                assert filtered.dtype == expected_dtype
+                np.testing.assert_allclose(
+                    filtered.magnitude, expected.magnitude, rtol=1e-5, atol=1e-5
+                )
+
+    def test_filter_signals_multiple_groups(self):
+        # Checks if signals selected with slice strings from segments with
+        # different durations are filtered in separate groups, with the same
+        # result as filtering each signal on its own with Elephant.
+        filter_kwargs = dict(
+            highpass_frequency=None,
+            lowpass_frequency=2 * pq.Hz,
+            order=2,
+            filter_function="sosfiltfilt",
+        )
+        signals = select_data(
+            generate_block(1), segment_index="all", analog_signal_index="0:1"
+        )
+        signals = [signal for segment_signals in signals for signal in segment_signals]
+        assert len({signal.shape[0] for signal in signals}) == 2
+
+        filtered_signals = _filter_signals(signals, **filter_kwargs)
+        assert len(filtered_signals) == len(signals)
+        for signal, filtered in zip(signals, filtered_signals):
+            with self.subTest(signal=signal.name):
+                expected = butter(signal, **filter_kwargs)
+                assert filtered.name == signal.name
+                np.testing.assert_allclose(
+                    filtered.magnitude, expected.magnitude, rtol=1e-5, atol=1e-5
+                )
+
+    def test_map_signal_groups_order(self):
+        # Checks if the signals are grouped by sampling rate and number of
+        # samples, and if the results are returned in the order of the input
+        # signals.
+        signals = [
+            get_analog_signal(5 * pq.Hz, 2, 1 * pq.s, "A", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 2, 1 * pq.s, "B", sampling_rate=50 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 3, 1 * pq.s, "C", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 2, 2 * pq.s, "D", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 1, 1 * pq.s, "E", sampling_rate=0.05 * pq.kHz),
+        ]
+        groups = []
+
+        def process_group(group_signals, sampling_frequency):
+            names = [signal.name for signal in group_signals]
+            groups.append((names, sampling_frequency))
+            return [f"{name} {sampling_frequency}" for name in names]
+
+        results = map_signal_groups(process_group, signals)
+        assert results == ["A 100.0", "B 50.0", "C 100.0", "D 100.0", "E 50.0"]
+        assert sorted(groups) == [
+            (["A", "C"], 100.0),
+            (["B", "E"], 50.0),
+            (["D"], 100.0),
+        ]
+
+    def test_map_signal_groups_threads(self):
+        # Checks if several groups are processed in a thread pool, while a
+        # single group is processed in the calling thread.
+        signals = [
+            get_analog_signal(5 * pq.Hz, 2, 1 * pq.s, "A", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 2, 1 * pq.s, "B", sampling_rate=50 * pq.Hz),
+        ]
+
+        def process_group(group_signals, sampling_frequency):
+            return [threading.current_thread()] * len(group_signals)
+
+        for selection, in_main_thread in ((signals[:1], True), (signals, False)):
+            with self.subTest(n_signals=len(selection)):
+                threads = map_signal_groups(process_group, selection)
+                assert len(threads) == len(selection)
+                for thread in threads:
+                    assert (thread is threading.main_thread()) == in_main_thread
+
+    def test_transform_signals_mixed_sampling_rates(self):
+        # Checks if transforming signals with different sampling rates and
+        # lengths gives the same result as transforming each signal on its
+        # own with Elephant.
+        signals = [
+            get_analog_signal(5 * pq.Hz, 2, 1 * pq.s, "A", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 3, 1 * pq.s, "B", sampling_rate=50 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 1, 1 * pq.s, "C", sampling_rate=100 * pq.Hz),
+            get_analog_signal(5 * pq.Hz, 2, 2 * pq.s, "D", sampling_rate=100 * pq.Hz),
+        ]
+        frequency = np.arange(2.0, 20.0, 4.0)
+        transformed = _transform_signals(
+            signals,
+            dtype="complex128",
+            frequency=frequency,
+            n_cycles=6.0,
+            zero_padding=True,
+        )
+        assert len(transformed) == len(signals)
+        for signal, coefficients in zip(signals, transformed):
+            with self.subTest(signal=signal.name):
+                expected = wavelet_transform(
+                    signal, frequency, n_cycles=6.0, zero_padding=True
+                )
+                assert coefficients.shape == expected.shape
+                np.testing.assert_allclose(coefficients, expected)
+
+    def test_freq_list(self):
+        # Checks if the frequency argument of the wavelet transform CLI is
+        # parsed as a single frequency or as a range with an inclusive stop,
+        # without extra frequencies from rounding errors.
+        for value, expected in (
+            ("5", [5.0]),
+            ("1:4:1", [1.0, 2.0, 3.0, 4.0]),
+            ("5:50:5", [5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 35.0, 40.0, 45.0, 50.0]),
+            ("0.1:0.3:0.1", [0.1, 0.2, 0.3]),
+            ("1:1.3:0.1", [1.0, 1.1, 1.2, 1.3]),
+            ("10:1:-1", [10.0, 9.0, 8.0, 7.0, 6.0, 5.0, 4.0, 3.0, 2.0, 1.0]),
+        ):
+            with self.subTest(value=value):
+                np.testing.assert_allclose(freq_list(value), expected, rtol=1e-12)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from os.path import splitext
-from typing import List, Optional, Union
+from typing import Callable, List, Optional, Union
 import quantities as pq
 import neo
 from nixio.exceptions.exceptions import InvalidFile
@@ -46,27 +50,33 @@ def _parse_slice(slice_str: Union[str, int]) -> Union[slice, int]:
     if isinstance(slice_str, int):
         return slice_str
     elif isinstance(slice_str, str):
-        try:
-            if slice_str == "all":
-                slice_str = ":"
-            parts = slice_str.split(":")
-
-            start = int(parts[0]) if parts[0] else None
-            stop = int(parts[1]) + 1 if len(parts) > 1 and parts[1] else None
-            step = int(parts[2]) if len(parts) > 2 and parts[2] else None
-
-            return slice(start, stop, step)
-        except ValueError:
-            raise ValueError(f"Invalid slice string: {slice_str}")
+        return _parse_slice_string(slice_str)
     else:
         return slice_str
 
 
+@lru_cache(maxsize=128)
+def _parse_slice_string(slice_str: str) -> slice:
+    # Cached, as the same few strings are parsed for every selection
+    try:
+        if slice_str == "all":
+            slice_str = ":"
+        parts = slice_str.split(":")
+
+        start = int(parts[0]) if parts[0] else None
+        stop = int(parts[1]) + 1 if len(parts) > 1 and parts[1] else None
+        step = int(parts[2]) if len(parts) > 2 and parts[2] else None
+
+        return slice(start, stop, step)
+    except ValueError:
+        raise ValueError(f"Invalid slice string: {slice_str}")
+
+
 def select_data(
     block: neo.core.Block,
-    segment_index: Union[int, str] = 0,
-    spike_train_index: Optional[Union[int, str]] = None,
-    analog_signal_index: Optional[Union[int, str]] = None,
+    segment_index: Union[int, slice, str] = 0,
+    spike_train_index: Optional[Union[int, slice, str]] = None,
+    analog_signal_index: Optional[Union[int, slice, str]] = None,
 ) -> List[Union[neo.core.SpikeTrain, neo.core.AnalogSignal]]:
     """
     Select data from a Neo Block object based on specified indices.
@@ -75,12 +85,12 @@ def select_data(
     ----------
     block : neo.core.Block
         The Neo Block object containing the data.
-    segment_index : int or str, optional
-        Index or slice string for selecting segments. Default is 0.
-    spike_train_index : int or str, optional
-        Index or slice string for selecting spike trains.
-    analog_signal_index : int or str, optional
-        Index or slice string for selecting analog signals.
+    segment_index : int, slice or str, optional
+        Index, slice or slice string for selecting segments. Default is 0.
+    spike_train_index : int, slice or str, optional
+        Index, slice or slice string for selecting spike trains.
+    analog_signal_index : int, slice or str, optional
+        Index, slice or slice string for selecting analog signals.
 
     Returns
     -------
@@ -98,28 +108,26 @@ def select_data(
     This function allows for flexible selection of data from a Neo Block.
     It can return either spike trains or analog signals based on the provided indices.
     The indices can be integers, slice objects, or slice strings (e.g., '1:5').
+    Slice objects are used as given, so their stop is exclusive, while the
+    stop of a slice string is inclusive.
     """
     try:
         if spike_train_index is not None:
             segments = block.segments[_parse_slice(segment_index)]
             if not isinstance(segments, list):
                 segments = [segments]
-            return [
-                segment.spiketrains[_parse_slice(spike_train_index)]
-                for segment in segments
-            ]
+            spike_train_slice = _parse_slice(spike_train_index)
+            return [segment.spiketrains[spike_train_slice] for segment in segments]
         elif analog_signal_index is not None:
             segments = block.segments[_parse_slice(segment_index)]
+            analog_signal_slice = _parse_slice(analog_signal_index)
             if not isinstance(segments, list):
-                analog_signals = segments.analogsignals[
-                    _parse_slice(analog_signal_index)
-                ]
+                analog_signals = segments.analogsignals[analog_signal_slice]
                 if not isinstance(analog_signals, list):
                     return [analog_signals]
                 return analog_signals
             return [
-                segment.analogsignals[_parse_slice(analog_signal_index)]
-                for segment in segments
+                segment.analogsignals[analog_signal_slice] for segment in segments
             ]
         else:
             raise ValueError("spike_train or analog_signal index not provided")
@@ -138,6 +146,102 @@ def select_data(
             ) from e
 
 
+def map_signal_groups(
+    process_group: Callable[[List[neo.core.AnalogSignal], float], list],
+    signals: List[neo.core.AnalogSignal],
+) -> list:
+    """
+    Process AnalogSignals in groups that share the sampling rate and the
+    number of samples.
+
+    Parameters
+    ----------
+    process_group : callable
+        Function called once per group with the list of AnalogSignals of the
+        group and their sampling rate in Hz. It must return one result per
+        signal, in the order of the signals it was given.
+    signals : list of neo.core.AnalogSignal
+        The AnalogSignals to process.
+
+    Returns
+    -------
+    list
+        The results for each signal, in the same order as `signals`.
+
+    Notes
+    -----
+    Grouping lets `process_group` stack the signals of a group along the
+    channel axis and handle them with a single call. When there are several
+    groups, they are processed concurrently in a thread pool, which is only
+    effective when `process_group` spends its time in routines that release
+    the GIL, such as the numpy and scipy signal processing functions.
+
+    The component CLIs take integer segment and analog signal indexes, so
+    they select a single AnalogSignal and never use the thread pool. Several
+    groups only occur for library callers that select signals with slices or
+    slice strings, e.g. all segments of a Block of different durations.
+    """
+    groups = defaultdict(list)
+    for index, signal in enumerate(signals):
+        sampling_frequency = signal.sampling_rate.rescale(pq.Hz).magnitude.item()
+        groups[(sampling_frequency, signal.shape[0])].append(index)
+
+    group_signals = [
+        [signals[index] for index in indexes] for indexes in groups.values()
+    ]
+    group_frequencies = [sampling_frequency for sampling_frequency, _ in groups]
+
+    if len(groups) > 1:
+        with ThreadPoolExecutor() as executor:
+            results = list(
+                executor.map(process_group, group_signals, group_frequencies)
+            )
+    else:
+        results = list(map(process_group, group_signals, group_frequencies))
+
+    signal_results = [None] * len(signals)
+    for indexes, group_result in zip(groups.values(), results):
+        for index, result in zip(indexes, group_result):
+            signal_results[index] = result
+    return signal_results
+
+
+# Session start time used when writing NWB files from Blocks that have
+# none. Taken once per process, so all Blocks saved by one component share it
+_SESSION_START_TIME = datetime.now(timezone.utc)
+
+# Extra positional arguments passed to the Neo IO classes when reading
+_IO_FLAGS = {"NixIO": ("ro",)}
+
+
+# Neo IO classes by the names `neo.io` exports them under, built once at
+# import. Class names are not used, as some differ from the exported name
+# (e.g., NeuroshareIO is NeurosharectypesIO) or are shared by several
+# classes (e.g., the NixIO of `neo.io.nixio` and of `neo.io.nixio_fr`)
+_IO_CLASSES = {
+    name: obj
+    for name, obj in vars(neo.io).items()
+    if isinstance(obj, type) and issubclass(obj, neo.io.baseio.BaseIO)
+}
+
+
+def _get_io_class(input_format: str) -> type:
+    """
+    Return the Neo IO class with the given name.
+
+    Raises
+    ------
+    ValueError
+        If Neo does not provide an IO class with that name.
+    """
+    try:
+        return _IO_CLASSES[input_format]
+    except KeyError:
+        raise ValueError(
+            f"Input_format is not supported by neo, provided: {input_format}"
+        )
+
+
 def _get_blackrock_io(input_file):
     data_full_path, file_ending = splitext(input_file) # TODO: change to Pathlib
     if file_ending == '.nev':
@@ -190,14 +294,14 @@ def load_data(
     This function uses Neo IO classes to read various neurophysiology file formats.
     If input_format is not specified, it attempts to determine the format automatically.
     Either block_index or block_name can be used to load a specific block, but not both.
-    If neither is provided, all blocks are returned.
+    If neither is provided, all blocks are returned. For NIX files, only the
+    requested block is read.
     """
     if input_format is None:
         candidate_io = neo.list_candidate_ios(input_file)
         if candidate_io:
             io_class = candidate_io[0]
-            flags = ["ro"] if io_class.__qualname__ == "NixIO" else []
-            io = io_class(input_file, *flags)
+            io = io_class(input_file, *_IO_FLAGS.get(io_class.__name__, ()))
         else:
             raise ValueError(
                 f"Please specify a valid input format, provided: {input_format}"
@@ -206,13 +310,9 @@ def load_data(
         if input_format == "BlackrockIO":
             io = _get_blackrock_io(input_file)
         else:
-            flags = ["ro"] if input_format == "NixIO" else []
+            io_class = _get_io_class(input_format)
             try:
-                io = getattr(neo.io, input_format)(input_file, *flags)
-            except AttributeError:
-                raise ValueError(
-                    f"Input_format is not supported by neo, provided: {input_format}"
-                )
+                io = io_class(input_file, *_IO_FLAGS.get(input_format, ()))
             except InvalidFile:
                 raise ValueError(
                     "input_file and input_format do not match, please provide valid file and correct input format"
@@ -222,6 +322,10 @@ def load_data(
         raise ValueError("Can not load by name and index simultaneously")
     elif block_index is not None:
         try:
+            if isinstance(io, neo.NixIO) and isinstance(block_index, int):
+                # Convert only the requested Block instead of the whole file;
+                # other index types are rejected below as for other formats
+                return io.read_block(index=block_index)
             return io.read()[block_index]
         except TypeError:
             raise ValueError(
@@ -231,6 +335,11 @@ def load_data(
             raise ValueError(f"block_index is not valid, provided: {block_index}")
     elif block_name is not None:
         try:
+            if isinstance(io, neo.NixIO):
+                try:
+                    return io.read_block(neoname=block_name)
+                except KeyError:
+                    raise ValueError("No block with block_name found")
             block = next(
                 (block for block in io.read() if block.name == block_name), None
             )
@@ -251,6 +360,17 @@ def load_data(
             )
 
 
+# Mode used to open the output file for each output format and save action.
+# NWBIO can only write whole files, so NWB files can not be updated
+_SAVE_MODES = {
+    ("NixIO", "new"): "ow",
+    ("NixIO", "replace"): "ow",
+    ("NixIO", "update"): "rw",
+    ("NWBIO", "new"): "w",
+    ("NWBIO", "replace"): "w",
+}
+
+
 def save_data(
     data: Union[neo.AnalogSignal, neo.SpikeTrain, neo.Block, neo.Segment],
     output_file: Union[str, Path],
@@ -281,13 +401,17 @@ def save_data(
     ValueError
         If the action is invalid, the output format is invalid, the file exists
         and action is "new", the file doesn't exist and action is "replace" or
-        "update", or if the output format can't be inferred.
+        "update", if the output format can't be inferred, or if the action is
+        "update" and the output format is NWB.
 
     Notes
     -----
     This function supports saving neo.AnalogSignal, neo.SpikeTrain, neo.Block,
     and neo.Segment objects. For AnalogSignal and SpikeTrain, a new Block and
     Segment are created to contain the data before saving.
+    NWB files require a session start time: if the Block has no
+    `session_start_time` annotation, its `rec_datetime` is used, or else the
+    time at which the module was imported.
     """
     valid_actions = {"new", "replace", "update"}
     valid_output_formats = {"NixIO", "NWBIO"}
@@ -308,6 +432,9 @@ def save_data(
                 "Could not infer output format from file extension and none was provided."
             )
 
+    if (output_format, action) not in _SAVE_MODES:
+        raise ValueError(f"Action '{action}' is not supported for {output_format}")
+
     if action == "new" and output_file.exists():
         raise ValueError(f"File {output_file} already exists and action is 'new'.")
     elif action == "replace" and not output_file.exists():
@@ -333,16 +460,23 @@ def save_data(
     if not output_dir.exists():
         output_dir.mkdir(parents=True)
 
-    if output_format == "NixIO":
-        with neo.NixIO(
-            output_file, mode="ow" if action in ["replace", "new"] else "rw"
-        ) as io:
-            io.write_block(saved_block)
-    elif output_format == "NWBIO":
-        with neo.NWBIO(
-            output_file, mode="w" if action in ["replace", "new"] else "?"
-        ) as io:
-            io.write_block(saved_block)
+    io_annotations = {}
+    if output_format == "NWBIO":
+        # NWB files require a session start time. It is given to the IO as a
+        # file annotation, so that the Block of the caller is not modified
+        if not {"session_start_time", "rec_datetime"} & saved_block.annotations.keys():
+            io_annotations["session_start_time"] = (
+                saved_block.rec_datetime or _SESSION_START_TIME
+            )
+
+    # NWBIO does not support the context manager protocol
+    io = _IO_CLASSES[output_format](
+        output_file, mode=_SAVE_MODES[(output_format, action)], **io_annotations
+    )
+    try:
+        io.write_block(saved_block)
+    finally:
+        io.close()
 
 
 def quantity_arg(arg: Optional[str]) -> Optional[pq.Quantity]:
@@ -380,7 +514,9 @@ def quantity_arg(arg: Optional[str]) -> Optional[pq.Quantity]:
     """
     if not arg:
         return None
-    value, unit = arg.split(" ")
+    value, separator, unit = arg.partition(" ")
+    if not separator or " " in unit:
+        raise ValueError(f"Invalid quantity string: {arg}")
     return pq.Quantity(float(value), units=unit)
 
 
@@ -405,7 +541,7 @@ def prepare_data(
         Action to perform on the data:
         - 'new': Create a new Block with provided data.
         - 'replace': Replace all data in the existing Block.
-        - 'add': Add new data to the existing Block.
+        - 'add': Add new data to the first Segment of the existing Block.
 
     Returns
     -------
@@ -446,9 +582,13 @@ def prepare_data(
             old_block.segments[0].spiketrains.extend(spike_train)
         return old_block
     elif action == "add":
+        # New data is added to the first segment, created if needed
+        if not old_block.segments:
+            old_block.segments.append(neo.Segment())
+        segment = old_block.segments[0]
         if analog_signal:
-            old_block.segments.analogsignals.extend(analog_signal)
+            segment.analogsignals.extend(analog_signal)
         if spike_train:
-            old_block.segments.spiketrains.extend(spike_train)
+            segment.spiketrains.extend(spike_train)
         return old_block
     return None
@@ -1,13 +1,14 @@
 #!/usr/bin/env python
 
 import argparse
+from functools import partial
 from pathlib import Path
 
 import numpy as np
 import quantities as pq
 import matplotlib.pyplot as plt
 import elephant
-from utils import load_data, select_data
+from utils import load_data, select_data, map_signal_groups
 
 
 def freq_list(value):
@@ -19,26 +20,31 @@ def freq_list(value):
 
         start = float(parts[0]) if parts[0] else 0
         step = float(parts[2]) if len(parts) > 2 and parts[2] else 1.0
-        stop = float(parts[1]) + step if len(parts) > 1 and parts[1] else step
-
-        return np.arange(start, stop, step, dtype=float)
-
-
-CLI = argparse.ArgumentParser()
-CLI.add_argument("--input_file", nargs="?", type=Path, required=True, help="path with file with the input data")
-CLI.add_argument("--input_format", nargs="?", type=str, default=None, help="format of the input data")
-CLI.add_argument("--output_file", nargs="?", type=Path, required=True, help="path to the file where to write data")
-CLI.add_argument("--block_index", nargs="?", type=int, default=0, help="Index of the block to process (default: 0)")
-CLI.add_argument("--block_name", nargs="?", type=str, default=None, help="Name of the block to process (optional)")
-CLI.add_argument("--segment_index", nargs="?", type=int, default=0, help="Index of the segment to process (default: 0)")
-CLI.add_argument("--analog_signal_index", nargs="?", type=int, default=0, help="Index of the analog signal to process (default: 0)")
-CLI.add_argument("--visualization_plots", type=bool, default=True, help="Generate visualization plots for each input signal. It is averaged over channels.")
-CLI.add_argument("--frequency", nargs="?", type=freq_list, required=True, help="Center frequency of the Morlet wavelet in Hz")
-CLI.add_argument("--n_cycles", nargs="?", type=float, default=6.0, help="Size of the mother wavelet (default: 6.0)")
-CLI.add_argument("--sampling_frequency", nargs="?", type=float, default=1.0, help="Sampling rate of the input data in Hz (default: 1.0)")
-CLI.add_argument("--zero_padding", nargs="?", type=bool, default=True, help="Specifies whether the data length is extended by padding zeros (default: True)")
-CLI.add_argument("--start_time", nargs="?", type=float, default=None, help="Start time of the signal slice in seconds")
-CLI.add_argument("--stop_time", nargs="?", type=float, default=None, help="Stop time of the signal slice in seconds")
+        stop = float(parts[1]) if len(parts) > 1 and parts[1] else 0
+
+        # The stop frequency is inclusive. Extend it by half a step, so that
+        # rounding errors neither drop the last frequency nor add one more
+        return np.arange(start, stop + 0.5 * step, step, dtype=float)
+
+
+def _build_cli():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--input_file", nargs="?", type=Path, required=True, help="path with file with the input data")
+    cli.add_argument("--input_format", nargs="?", type=str, default=None, help="format of the input data")
+    cli.add_argument("--output_file", nargs="?", type=Path, required=True, help="path to the file where to write data")
+    cli.add_argument("--block_index", nargs="?", type=int, default=0, help="Index of the block to process (default: 0)")
+    cli.add_argument("--block_name", nargs="?", type=str, default=None, help="Name of the block to process (optional)")
+    cli.add_argument("--segment_index", nargs="?", type=int, default=0, help="Index of the segment to process (default: 0)")
+    cli.add_argument("--analog_signal_index", nargs="?", type=int, default=0, help="Index of the analog signal to process (default: 0)")
+    cli.add_argument("--visualization_plots", type=bool, default=True, help="Generate visualization plots for each input signal. It is averaged over channels.")
+    cli.add_argument("--frequency", nargs="?", type=freq_list, required=True, help="Center frequency of the Morlet wavelet in Hz")
+    cli.add_argument("--n_cycles", nargs="?", type=float, default=6.0, help="Size of the mother wavelet (default: 6.0)")
+    cli.add_argument("--sampling_frequency", nargs="?", type=float, default=1.0, help="Ignored; the sampling rate is read from the input AnalogSignals (kept for compatibility)")
+    cli.add_argument("--zero_padding", nargs="?", type=bool, default=True, help="Specifies whether the data length is extended by padding zeros (default: True)")
+    cli.add_argument("--start_time", nargs="?", type=float, default=None, help="Start time of the signal slice in seconds (default: start of the signal)")
+    cli.add_argument("--stop_time", nargs="?", type=float, default=None, help="Stop time of the signal slice in seconds (default: end of the signal)")
+    cli.add_argument("--dtype", nargs="?", type=str, default="complex128", choices=["complex128", "complex64"], help="Data type of the saved wavelet coefficients (default: complex128)")
+    return cli
 
 
 def _plot_wavelet_transform(input_signal,
@@ -50,10 +56,12 @@ def _plot_wavelet_transform(input_signal,
 
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    im = ax.pcolor(input_signal.times,
-                   frequency,
-                   np.transpose(avg_wavelet_spectrum),
-                   cmap='cividis', shading='auto')
+    # A rasterized mesh keeps the PDF small and fast to write; drawing each
+    # time-frequency cell as a vector patch scales with the signal length
+    im = ax.pcolormesh(input_signal.times,
+                       frequency,
+                       np.transpose(avg_wavelet_spectrum),
+                       cmap='cividis', shading='auto', rasterized=True)
     fig.colorbar(im)
 
     time_units = input_signal.times.units.dimensionality
@@ -63,6 +71,7 @@ def _plot_wavelet_transform(input_signal,
 
     fig.savefig(f"wavelet_spectrum_{signal_index}.pdf",
                 format="pdf")
+    plt.close(fig)
 
 
 def _save_wavelet_transform(transformed_signals, output_file,
@@ -74,6 +83,45 @@ def _save_wavelet_transform(transformed_signals, output_file,
     np.savez(**arrays, file=output_file, frequency=frequency)
 
 
+def _transform_group(signals, sampling_frequency, dtype, **transform_kwargs):
+    """
+    Transform AnalogSignals that share the sampling rate and the number of
+    samples with a single call to the Elephant wavelet_transform function.
+    Each returned array has the shape (time, channels, frequencies), as if
+    the corresponding signal had been transformed on its own, and is cast
+    to `dtype`.
+    """
+    # Elephant expects the time axis last for plain arrays
+    data = np.hstack([signal.magnitude for signal in signals]).T
+    coefficients = elephant.signal_processing.wavelet_transform(
+        signal=data,
+        sampling_frequency=sampling_frequency,
+        **transform_kwargs,
+    )
+    coefficients = np.moveaxis(coefficients, -1, 0).astype(dtype, copy=False)
+
+    # Split the channels back into the original AnalogSignals
+    transformed_signals = []
+    start = 0
+    for signal in signals:
+        stop = start + signal.shape[1]
+        transformed_signals.append(coefficients[:, start:stop])
+        start = stop
+    return transformed_signals
+
+
+def _transform_signals(signals, dtype, **transform_kwargs):
+    """
+    Transform a list of AnalogSignals with the Elephant wavelet_transform
+    function.
+    Signals that share the sampling rate and the number of samples are
+    transformed in a single call, so the Morlet wavelets are generated and
+    the FFTs are computed once per group instead of once per signal.
+    """
+    transform_group = partial(_transform_group, dtype=dtype, **transform_kwargs)
+    return map_signal_groups(transform_group, signals)
+
+
 def wavelet_transform(
     input_file,
     input_format,
@@ -89,7 +137,11 @@ def wavelet_transform(
     zero_padding,
     start_time,
     stop_time,
+    dtype,
 ):
+    # `sampling_frequency` is not used: the sampling rate of each signal is
+    # taken from the Neo AnalogSignals, as Elephant does for Neo input
+
     # Load Block from which AnalogSignals will be selected
     block = load_data(
         input_file,
@@ -102,22 +154,23 @@ def wavelet_transform(
     signals = select_data(
         block, segment_index=segment_index, analog_signal_index=analog_signal_index
     )
-    # To avoid using too much memory, slice the signals if start and stop times are provided
-    if start_time is not None and stop_time is not None:
-        signals = [signal.time_slice(start_time * pq.s, stop_time * pq.s) for signal in signals]
-
-    # Iterate over all loaded AnalogSignals
-    transformed_signals = [
-        # Transform using Elephant wavelet_transform function
-        elephant.signal_processing.wavelet_transform(
-            signal=signal,
-            frequency=frequency,
-            n_cycles=n_cycles,
-            sampling_frequency=sampling_frequency,
-            zero_padding=zero_padding,
-        )
-        for signal in signals
-    ]
+    # To avoid using too much memory, slice the signals if a start or stop time is
+    # provided; a missing bound keeps the signal start or end
+    if start_time is not None or stop_time is not None:
+        t_start = start_time * pq.s if start_time is not None else None
+        t_stop = stop_time * pq.s if stop_time is not None else None
+        signals = [signal.time_slice(t_start, t_stop) for signal in signals]
+
+    # Transform all loaded AnalogSignals using Elephant wavelet_transform function.
+    # From the CLI this is a single signal; signals are only grouped and
+    # transformed in a thread pool when called with slices or slice strings
+    transformed_signals = _transform_signals(
+        signals,
+        frequency=frequency,
+        n_cycles=n_cycles,
+        zero_padding=zero_padding,
+        dtype=dtype,
+    )
 
     # Save the wavelet coefficients to a pickle file
     _save_wavelet_transform(transformed_signals, output_file, frequency)
@@ -130,5 +183,5 @@ def wavelet_transform(
 
 
 if __name__ == "__main__":
-    args, unknown = CLI.parse_known_args()
+    args, unknown = _build_cli().parse_known_args()
     wavelet_transform(**vars(args))
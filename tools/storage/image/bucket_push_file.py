@@ -1,59 +1,106 @@
 #!/usr/bin/env python3
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import hashlib
 import json
 import mimetypes
+import os
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 
-def get_checksum(file_path):
-    with open(file_path, "rb") as fp:
-        return hashlib.sha1(fp.read()).hexdigest()
+class _ChecksumReader:
+    """
+    Read-only file wrapper that updates a SHA-1 checksum with the data as it
+    is read, so that a file can be streamed to the bucket and checksummed in
+    a single pass. The size is exposed through len() so that requests sends a
+    Content-Length header instead of a chunked body.
+    """
 
+    def __init__(self, fp, size):
+        self._fp = fp
+        self._size = size
+        self.sha1 = hashlib.sha1()
 
-# function that pushes an object to a Collab bucket
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        data = self._fp.read(size)
+        self.sha1.update(data)
+        return data
+
+
+DATA_PROXY_ENDPOINT = 'https://data-proxy.ebrains.eu/api/v1/buckets'
+# number of files uploaded concurrently
+MAX_UPLOADS = 8
+# retry policy for transient data-proxy errors when requesting upload urls
+# uploads themselves are not retried, as the streamed file cannot be rewound
+DATA_PROXY_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                         raise_on_status=False)
+
+
+# function that pushes a single file to a Collab bucket
+# returns the remote file description, or the error content if the upload failed
+def _push_file(session, bucket_url, headers, file):
+    basename = Path(file).name
+    remote_url = f"{bucket_url}/{basename}"
+    r_url = session.put(remote_url, headers=headers)   # temp url
+    if r_url.status_code != 200:
+        return None, r_url.content
+    upload_url = r_url.json()['url']
+    size = os.path.getsize(file)
+    with open(file, "rb") as fp:
+        reader = _ChecksumReader(fp, size)
+        response = session.put(upload_url, data=reader)
+    if response.status_code not in (200, 201):
+        return None, response.content
+    return {
+        "location": remote_url,
+        "basename": basename,
+        "checksum": f"sha1${reader.sha1.hexdigest()}",
+        "size": size,
+        "format": mimetypes.guess_type(file, strict=False)[0]
+    }, None
+
+
+# function that pushes objects to a Collab bucket
+# files are uploaded concurrently, as each upload mostly waits on the network
 def bucket_push_file(bucket_id, target_folder, token, *files):
-    # get an upload url
-    DATA_PROXY_ENDPOINT = 'https://data-proxy.ebrains.eu/api/v1/buckets'
     AUTHORIZATION_HEADERS = {'Authorization': f'Bearer {token}'}
     target_folder = target_folder.strip("/")
+    bucket_url = f"{DATA_PROXY_ENDPOINT}/{bucket_id}/{target_folder}"
     remote_files = []
     errors = {}
-    for file in files:
-        basename = Path(file).name
-        remote_url = f"{DATA_PROXY_ENDPOINT}/{bucket_id}/{target_folder}/{basename}"
-        r_url = requests.put(remote_url, headers=AUTHORIZATION_HEADERS)   # temp url
-        if r_url.status_code != 200:
-            errors[file] = r_url.content
-        upload_url = r_url.json()['url']
-        response = requests.put(upload_url, data=open(file, 'rb').read())
-        if response.status_code in (200, 201):
-            remote_files.append({
-                "location": remote_url,
-                "basename": basename,
-                "checksum": f"sha1${get_checksum(file)}",
-                "size": Path(file).stat().st_size,
-                "format": mimetypes.guess_type(file, strict=False)[0]
-            })
-        else:
-            errors[file] = response.content
+    with requests.Session() as session, \
+            ThreadPoolExecutor(max_workers=MAX_UPLOADS) as executor:
+        session.mount(DATA_PROXY_ENDPOINT, HTTPAdapter(max_retries=DATA_PROXY_RETRY))
+        push_file = partial(_push_file, session, bucket_url, AUTHORIZATION_HEADERS)
+        for file, (remote_file, error) in zip(files, executor.map(push_file, files)):
+            if error is None:
+                remote_files.append(remote_file)
+            else:
+                errors[file] = error
     if errors:
         raise Exception(str(errors))
     return remote_files
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument('bucket_id', help='bucket where the file will be uploaded')
-parser.add_argument('target_folder', help='path to folder within bucket')
-parser.add_argument('token', help='token for access to the data-proxy')
-parser.add_argument('files', help='files to be uploaded', nargs='+')
-args = parser.parse_args()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('bucket_id', help='bucket where the file will be uploaded')
+    parser.add_argument('target_folder', help='path to folder within bucket')
+    parser.add_argument('token', help='token for access to the data-proxy')
+    parser.add_argument('files', help='files to be uploaded', nargs='+')
+    args = parser.parse_args()
 
-# push files to bucket
-response = bucket_push_file(args.bucket_id, args.target_folder, args.token, *args.files)
+    # push files to bucket
+    response = bucket_push_file(args.bucket_id, args.target_folder, args.token, *args.files)
 
-with open("cwl.output.json", "w") as fp:
-    json.dump({"remote_files": response}, fp, indent=2)
-    fp.write("\n")
+    with open("cwl.output.json", "w") as fp:
+        json.dump({"remote_files": response}, fp, indent=2)
+        fp.write("\n")